@@ -10,6 +10,7 @@ from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import SupabaseVectorStore
 from langchain_core.messages import SystemMessage, HumanMessage
 from langgraph.graph import StateGraph, END
+from embedding_service import BatchedEmbeddings
 #USE_LLM=False
 USE_LLM = os.getenv("USE_LLM", "1") == "1"
 
@@ -26,7 +27,8 @@ if missing:
 # clients
 supa = supabase.create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
 llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=os.getenv("GOOGLE_API_KEY"), temperature=0.2)
-emb = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+# policy queries go through the micro-batcher + LRU cache (see embedding_service.py)
+emb = BatchedEmbeddings(HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2"))
 vector_store = SupabaseVectorStore(client=supa, embedding=emb, table_name="documents", query_name="match_documents")
 
 class AgentState(TypedDict):
@@ -0,0 +1,217 @@
+# bench_embeddings.py -> checks + throughput for embedding_service.BatchedEmbeddings
+# Usage:
+#   python bench_embeddings.py           # fake model (no torch needed)
+#   python bench_embeddings.py --real    # all-MiniLM-L6-v2 via HuggingFaceEmbeddings
+# Part 1 asserts batching, LRU eviction, in-flight sharing, result copies, no
+# idle wait, the error path, caller cancellation, timeouts and cleanup. Part 2 compares queries/sec: N threads calling the model
+# one query at a time vs the same threads going through the batcher.
+import sys, gc, time, asyncio, threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutTimeout
+from langchain_core.embeddings import Embeddings
+from embedding_service import BatchedEmbeddings
+
+
+class FakeEmbeddings(Embeddings):
+    """Cost model of a small CPU encoder: fixed per-call overhead + per-text cost."""
+
+    def __init__(self, call_ms=8.0, item_ms=0.5, fail_on=None, short=False):
+        self.call_ms, self.item_ms = call_ms, item_ms
+        self.fail_on, self.short = fail_on, short
+        self.calls, self.texts = 0, 0
+        self.gate = None  # threading.Event -> block until set
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        if self.gate is not None:
+            self.gate.wait()
+        with self._lock:  # one forward pass at a time, like one model instance
+            time.sleep((self.call_ms + self.item_ms * len(texts)) / 1000.0)
+            self.calls += 1
+            self.texts += len(texts)
+        if self.fail_on and self.fail_on in texts:
+            raise RuntimeError("boom")
+        out = [[float(len(t)), float(sum(map(ord, t)))] for t in texts]
+        return out[:-1] if self.short else out
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def check_batching():
+    base = FakeEmbeddings()
+    e = BatchedEmbeddings(base, max_batch_size=16, max_wait_ms=5)
+    with ThreadPoolExecutor(32) as ex:
+        list(ex.map(e.embed_query, [f"q {i}" for i in range(64)]))
+    assert base.texts == 64 and base.calls < 64, (base.calls, base.texts)
+    print(f"  batching: 64 queries in {base.calls} model calls")
+
+
+def check_lru():
+    base = FakeEmbeddings(call_ms=0, item_ms=0)
+    e = BatchedEmbeddings(base, max_wait_ms=0, cache_size=2)
+    for q in ["a", "b", "  A ", "c", "a"]:  # "  A " hits "a"; "c" evicts "b"; ...
+        e.embed_query(q)
+    e.embed_query("b")                       # ... so "b" misses again
+    s = e.stats()
+    assert (s["hits"], s["misses"], s["cache_size"]) == (2, 4, 2), s
+    print("  lru: normalization hit + eviction ok")
+
+
+def check_inflight_shared():
+    base = FakeEmbeddings(call_ms=0, item_ms=0)
+    base.gate = threading.Event()
+    e = BatchedEmbeddings(base, max_wait_ms=0)
+    first = e.submit("same")
+    time.sleep(0.05)  # worker is now blocked on the gate with "same"
+    dupes = [e.submit("Same "), e.submit("same")]
+    base.gate.set()
+    vals = [f.result(timeout=1) for f in [first] + dupes]
+    assert base.texts == 1 and vals[0] == vals[1] == vals[2], (base.texts, vals)
+    print("  in-flight duplicates share one embedding")
+
+
+def check_text_and_copies():
+    base = FakeEmbeddings(call_ms=0, item_ms=0)
+    e = BatchedEmbeddings(base, max_wait_ms=0)
+    v = e.embed_query("Loan Tenure")
+    assert v == [11.0, float(sum(map(ord, "Loan Tenure")))], v  # original text, not the key
+    v.append(99.0)  # caller mutates its result ...
+    assert e.embed_query("loan tenure") == v[:2]  # ... cache hit is unaffected
+    print("  model gets caller's text; callers get their own copies")
+
+
+def check_idle_no_wait():
+    base = FakeEmbeddings(call_ms=0, item_ms=0)
+    e = BatchedEmbeddings(base, max_wait_ms=200, cache_size=0)
+    e.embed_query("warm")
+    start = time.perf_counter()
+    e.embed_query("lone")
+    took = time.perf_counter() - start
+    assert took < 0.1, took
+    print(f"  lone caller skips max_wait ({took*1000:.1f} ms)")
+
+
+def check_errors():
+    base = FakeEmbeddings(call_ms=0, item_ms=0, fail_on="bad")
+    e = BatchedEmbeddings(base, max_wait_ms=0)
+    try:
+        e.embed_query("bad")
+        raise AssertionError("expected failure")
+    except RuntimeError:
+        pass
+    assert e.embed_query("good") == [4.0, float(sum(map(ord, "good")))]
+    base.short = True  # model returns fewer vectors than queries
+    try:
+        e.embed_query("short")
+        raise AssertionError("expected length check")
+    except ValueError:
+        pass
+    base.short = False
+    e.embed_query("after")
+    print("  error path: batch fails, worker keeps running")
+
+
+def check_cancel():
+    base = FakeEmbeddings(call_ms=0, item_ms=0)
+    base.gate = threading.Event()
+    e = BatchedEmbeddings(base, max_wait_ms=20)
+    a, b = e.submit("a"), e.submit("b")
+    a1, a2 = e.submit("x"), e.submit("x")
+    a.cancel()
+    a1.cancel()
+    base.gate.set()
+    assert b.result(timeout=1) and a2.result(timeout=1)
+    assert e.embed_query("later")  # worker still alive
+
+    async def cancelled_caller():
+        base.gate.clear()
+        t = asyncio.ensure_future(e.aembed_query("y"))
+        other = e.submit("y")
+        await asyncio.sleep(0.01)
+        t.cancel()
+        base.gate.set()
+        return other.result(timeout=1)
+
+    assert asyncio.run(cancelled_caller())
+    print("  cancelling one caller leaves the others + worker intact")
+
+
+def check_timeout():
+    base = FakeEmbeddings(call_ms=0, item_ms=0)
+    base.gate = threading.Event()
+    e = BatchedEmbeddings(base, max_wait_ms=0, timeout_s=0.1)
+    try:
+        e.embed_query("stuck")
+        raise AssertionError("expected timeout")
+    except FutTimeout:
+        pass
+
+    async def async_caller():
+        try:
+            await e.aembed_query("stuck async")
+            raise AssertionError("expected async timeout")
+        except asyncio.TimeoutError:
+            pass
+
+    asyncio.run(async_caller())
+    base.gate.set()
+    print("  embed_query / aembed_query time out instead of hanging")
+
+
+def check_freed():
+    import embedding_service
+    e = BatchedEmbeddings(FakeEmbeddings(call_ms=0, item_ms=0))
+    e.embed_query("x")
+    worker = e._worker
+    del e
+    gc.collect()
+    worker.join(1)
+    assert not worker.is_alive() and len(embedding_service._instances) == 0
+    print("  unused instance is freed and its worker thread exits")
+
+
+def throughput(base, threads=32, per_thread=8):
+    qs = [[f"policy question {t} {i}" for i in range(per_thread)] for t in range(threads)]
+    total = threads * per_thread
+
+    def run(fn):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as ex:
+            list(ex.map(lambda chunk: [fn(q) for q in chunk], qs))
+        return total / (time.perf_counter() - start)
+
+    single = run(base.embed_query)
+    batched = run(BatchedEmbeddings(base, cache_size=0).embed_query)  # cache off: measure batching only
+    return single, batched
+
+
+def main():
+    real = "--real" in sys.argv
+    if not real:
+        print("checks:")
+        check_batching()
+        check_lru()
+        check_inflight_shared()
+        check_text_and_copies()
+        check_idle_no_wait()
+        check_errors()
+        check_cancel()
+        check_timeout()
+        gc.collect()
+        check_freed()
+
+    if real:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        base = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+        base.embed_query("warm up")
+    else:
+        base = FakeEmbeddings()
+    print(f"throughput ({'MiniLM' if real else 'fake model'}):")
+    print(f"{'threads':>8}{'single q/s':>12}{'batched q/s':>13}")
+    for n in (1, 4, 16, 32):
+        single, batched = throughput(base, threads=n)
+        print(f"{n:>8}{single:>12.1f}{batched:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+# embedding_service.py
+# Micro-batched query embeddings with an LRU cache.
+# Concurrent embed_query calls are queued, grouped into small batches and run
+# on one worker thread, so the model does one batched forward pass instead of
+# many single ones competing with request handling.
+import os, logging, threading, queue, time, weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List, Dict, Any
+from langchain_core.embeddings import Embeddings
+
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "32"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "1024"))
+# upper bound for one embed_query call, so a stuck batch fails the request
+# instead of hanging a threadpool thread forever
+EMBED_TIMEOUT_S = float(os.getenv("EMBED_TIMEOUT_S", "30"))
+
+
+def normalize_query(text: str) -> str:
+    # cache/in-flight key only (the model still gets the caller's text).
+    # all-MiniLM-L6-v2 uses an uncased tokenizer, so case and extra spaces
+    # don't change the embedding -> safe to fold them for the key
+    return " ".join((text or "").split()).lower()
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Wraps another Embeddings object (e.g. HuggingFaceEmbeddings).
+      - embed_query: normalized -> LRU cache -> micro-batch on worker thread
+      - embed_documents: passed straight to the base model (bulk ingestion)
+    """
+
+    def __init__(self, base: Embeddings, max_batch_size: int = EMBED_MAX_BATCH,
+                 max_wait_ms: float = EMBED_MAX_WAIT_MS, cache_size: int = EMBED_CACHE_SIZE,
+                 timeout_s: float = EMBED_TIMEOUT_S):
+        self.base = base
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.cache_size = max(0, cache_size)
+        self.timeout = timeout_s if timeout_s and timeout_s > 0 else None
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "batches": 0, "embedded": 0}
+        self._reset_runtime()
+        _instances.add(self)
+
+    def _reset_runtime(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_pid = None
+        self._last_batch = 1
+
+    # ---- public Embeddings API ----
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        fut = self.submit(text)
+        try:
+            return fut.result(timeout=self.timeout)
+        finally:
+            fut.cancel()  # no-op if done; only drops this caller's wrapper
+
+    async def aembed_query(self, text: str) -> List[float]:
+        import asyncio
+        return await asyncio.wait_for(asyncio.wrap_future(self.submit(text)), self.timeout)
+
+    def submit(self, text: str) -> Future:
+        """Returns a Future owned by this caller; cancelling it never affects
+        other callers waiting on the same query or the worker thread."""
+        key = normalize_query(text)
+        with self._lock:
+            vec = self._cache.get(key)
+            if vec is not None:
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+                fut = Future()
+                fut.set_result(list(vec))  # copy: callers must not mutate the cache
+                return fut
+            # same query already waiting for a batch -> share its result
+            shared = self._inflight.get(key)
+            if shared is not None:
+                self._stats["hits"] += 1
+            else:
+                self._stats["misses"] += 1
+                shared = Future()
+                self._inflight[key] = shared
+                self._ensure_worker()
+                # embed the caller's own text; the normalized form is only the
+                # cache key (matches for uncased models like MiniLM)
+                self._queue.put((key, text, shared))
+        return _follow(shared)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+            out["cache_size"] = len(self._cache)
+            out["avg_batch"] = round(out["embedded"] / out["batches"], 2) if out["batches"] else 0
+        return out
+
+    # ---- worker ----
+    def _ensure_worker(self):
+        # called with self._lock held; worker is started lazily on first miss
+        if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+            return
+        self._worker_pid = os.getpid()
+        # the thread only holds a weakref + the queue, so an unused instance
+        # (and its model/cache) can still be freed; the finalizer then wakes
+        # the thread with _STOP so it exits
+        self._worker = threading.Thread(target=_worker_loop, args=(weakref.ref(self), self._queue),
+                                        name="embed-batcher", daemon=True)
+        self._worker.start()
+        weakref.finalize(self, self._queue.put, _STOP)
+
+    def _collect_batch(self, first):
+        batch = [first]
+        # idle (nothing else queued, last batch was a single query) -> run now
+        # instead of making a lone caller pay max_wait on every query; under
+        # load queries still pile up while the previous forward pass runs
+        if self._last_batch <= 1 and self._queue.empty():
+            self._last_batch = 1
+            return batch
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._last_batch = len(batch)
+        return batch
+
+    def _run_batch(self, first):
+        batch = self._collect_batch(first)
+        try:
+            self._process(batch)
+        except Exception as e:
+            # never let one bad batch stop the loop; fail whatever is left
+            logging.exception("Embedding batch failed")
+            with self._lock:
+                for k, _, _ in batch:
+                    self._inflight.pop(k, None)
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+
+    def _process(self, batch):
+        keys = [k for k, _, _ in batch]
+        vectors = self.base.embed_documents([t for _, t, _ in batch])
+        if len(vectors) != len(keys):
+            raise ValueError(f"Embedding model returned {len(vectors)} vectors for {len(keys)} queries")
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["embedded"] += len(batch)
+            for k, vec in zip(keys, vectors):
+                self._inflight.pop(k, None)
+                if self.cache_size:
+                    self._cache[k] = vec
+                    self._cache.move_to_end(k)
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+        for (_, _, fut), vec in zip(batch, vectors):
+            if not fut.done():
+                fut.set_result(vec)
+
+
+_STOP = object()
+
+
+def _worker_loop(ref, q):
+    # holds the instance strongly only while a batch is being run
+    while True:
+        first = q.get()
+        if first is _STOP:
+            return
+        inst = ref()
+        if inst is None:
+            return
+        inst._run_batch(first)
+        del inst
+
+
+# preload-and-fork (gunicorn.conf.py): threads/locks don't survive fork, so
+# each worker gets fresh ones; the model weights stay shared. One hook for all
+# instances; neither the WeakSet nor the worker thread keeps them alive.
+_instances: "weakref.WeakSet[BatchedEmbeddings]" = weakref.WeakSet()
+
+
+def _reset_after_fork():
+    for inst in list(_instances):
+        inst._reset_runtime()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _follow(shared: Future) -> Future:
+    # per-caller wrapper around the shared in-flight future
+    fut = Future()
+
+    def copy(src: Future):
+        if fut.done():  # caller already cancelled / timed out
+            return
+        exc = src.exception()
+        try:
+            if exc is not None:
+                fut.set_exception(exc)
+            else:
+                fut.set_result(list(src.result()))  # own copy per caller
+        except Exception:  # lost a race with the caller's cancel()
+            pass
+
+    shared.add_done_callback(copy)
+    return fut
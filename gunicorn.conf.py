@@ -0,0 +1,64 @@
+# gunicorn.conf.py
+# Multi-worker launch with one shared embedding model:
+#   gunicorn main:app -c gunicorn.conf.py
+# The master imports main.py -> ai_engine.py (MiniLM weights, tokenizer, torch,
+# clients) ONCE, then forks. Workers share those pages copy-on-write instead of
+# each loading its own copy. Check per-worker cost with measure_workers.py.
+import os, gc, multiprocessing
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn_worker.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+pidfile = os.getenv("GUNICORN_PIDFILE", "/tmp/clickpe-gunicorn.pid")
+
+# GUNICORN_PRELOAD=0 -> every worker loads its own model (baseline for measuring)
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+if preload_app:
+    # the Gemini client may be built on gRPC, which needs this set before
+    # import to stay usable in forked children
+    os.environ.setdefault("GRPC_ENABLE_FORK_SUPPORT", "1")
+    os.environ.setdefault("GRPC_POLL_STRATEGY", "poll")
+    # No cyclic GC in the master while the app loads: a collection writes to
+    # the GC header of every tracked object, which would dirty (and later
+    # copy) those pages in every worker. Re-enabled in when_ready, and in
+    # on_reload because SIGHUP re-runs this file but not when_ready.
+    gc.disable()
+
+
+def when_ready(server):
+    # App is loaded (preload), workers not forked yet.
+    # gc.freeze() moves every object into the permanent generation so the
+    # workers' collectors never walk (= write to) the master's objects.
+    # The weight buffers themselves are plain tensor storage, not PyObjects:
+    # refcount changes on the Tensor/Parameter wrappers touch only the small
+    # object headers, never the pages holding the weights.
+    # Note: don't run a warm-up embed here; starting torch's OpenMP pool in
+    # the master before fork can hang the workers.
+    if preload_app:
+        gc.freeze()
+        # frozen objects are skipped by collections, so the master can collect
+        # its own new cycles again without touching the shared pages
+        gc.enable()
+        server.log.info("Preloaded app, froze %d objects for copy-on-write sharing", gc.get_freeze_count())
+
+
+def on_reload(server):
+    # config was re-executed (gc.disable above); the app is not reloaded
+    # with preload_app, so there is nothing to freeze -> just turn GC back on
+    if preload_app:
+        gc.enable()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        gc.enable()
+    # torch intra-op threads per worker; default splits the cores between the
+    # workers actually configured (-w/--workers is applied after this file)
+    threads = int(os.getenv("EMBED_TORCH_THREADS", "0")) or max(1, multiprocessing.cpu_count() // max(1, server.cfg.workers))
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except Exception:
+        server.log.exception("Could not set torch threads")
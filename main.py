@@ -10,6 +10,7 @@ from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
 import pandas as pd
@@ -18,6 +19,7 @@ import logging
 
 # Import your AI engine function
 from ai_engine import process_chat  # expects (session_id, message) -> str
+from ai_engine import emb  # batched query embeddings, stats shown in /health
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
@@ -101,8 +103,9 @@ async def chat_api(req: ChatReq):
         except Exception:
             logging.exception("Failed to persist user chat (continuing)")
 
-        # call AI engine (synchronous)
-        response_text = process_chat(req.session_id, req.message)
+        # call AI engine (synchronous) off the event loop, so concurrent chats
+        # overlap and their policy queries can share an embedding batch
+        response_text = await run_in_threadpool(process_chat, req.session_id, req.message)
 
         # persist assistant reply
         try:
@@ -208,4 +211,4 @@ async def transaction_logs(limit: int = 10, offset: int = 0):
 
 @app.get("/health")
 async def health():
-    return JSONResponse({"status":"ok", "time": datetime.datetime.utcnow().isoformat()})
+    return JSONResponse({"status":"ok", "time": datetime.datetime.utcnow().isoformat(), "embeddings": emb.stats()})
@@ -0,0 +1,68 @@
+# measure_workers.py -> per-worker memory of a running gunicorn (Linux only)
+# Usage:
+#   gunicorn main:app -c gunicorn.conf.py          # preload (shared model)
+#   python measure_workers.py [master_pid]
+#   GUNICORN_PRELOAD=0 gunicorn main:app -c gunicorn.conf.py   # baseline
+#   python measure_workers.py
+# RSS counts shared pages in full for every process, so it over-reports.
+# PSS splits shared pages between the processes using them, and Private is
+# what a worker costs on its own -> compare Private/PSS between the two runs.
+import os, sys
+
+FIELDS = ["Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"]
+
+
+def read_mem(pid: int) -> dict:
+    out = {k: 0 for k in FIELDS}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in out:
+                out[key] = int(rest.split()[0])  # kB
+    out["Private"] = out["Private_Clean"] + out["Private_Dirty"]
+    out["Shared"] = out["Shared_Clean"] + out["Shared_Dirty"]
+    return out
+
+
+def children(pid: int) -> list:
+    kids = []
+    for tid in os.listdir(f"/proc/{pid}/task"):
+        try:
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                kids += [int(p) for p in f.read().split()]
+        except FileNotFoundError:
+            pass
+    return kids
+
+
+def mb(kb: int) -> str:
+    return f"{kb/1024:8.1f}"
+
+
+def main():
+    if len(sys.argv) > 1:
+        master = int(sys.argv[1])
+    else:
+        with open(os.getenv("GUNICORN_PIDFILE", "/tmp/clickpe-gunicorn.pid")) as f:
+            master = int(f.read().strip())
+    workers = children(master)
+    if not workers:
+        print("No workers found under pid", master)
+        return
+
+    print(f"{'role':<8}{'pid':>8}{'RSS MB':>10}{'PSS MB':>10}{'Shared MB':>11}{'Private MB':>12}")
+    rows = [("master", master, read_mem(master))] + [("worker", w, read_mem(w)) for w in workers]
+    for role, pid, m in rows:
+        print(f"{role:<8}{pid:>8}{mb(m['Rss']):>10}{mb(m['Pss']):>10}{mb(m['Shared']):>11}{mb(m['Private']):>12}")
+
+    w = [m for role, _, m in rows if role == "worker"]
+    total_pss = sum(m["Pss"] for _, _, m in rows)
+    avg_private = sum(m["Private"] for m in w) / len(w)
+    print()
+    print(f"workers: {len(w)}")
+    print(f"total PSS (real RAM used by master+workers): {mb(total_pss).strip()} MB")
+    print(f"avg private per worker (cost of one more worker): {mb(avg_private).strip()} MB")
+
+
+if __name__ == "__main__":
+    main()